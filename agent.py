@@ -4,11 +4,13 @@ import math
 import uuid
 import time
 from pygame.math import Vector3
-from OpenGL.GL import *
 
 from receptor import Receptor
 from agent_resources import Resources
 from consts import Consts
+from lazy_imports import lazy_import
+
+GL = lazy_import("OpenGL.GL")
 
 class Agent:
     """
@@ -19,19 +21,31 @@ class Agent:
         receptors (list): List of Receptor objects.
         resources (Resource): Resource object managing the agent's resources.
         connected_agents (list): List of connected Agent objects.
+        connection_version (int): Incremented whenever a receptor of the agent connects or disconnects.
         is_bad (bool): Whether the agent is a "bad" agent.
         velocity (Vector3): The agent's current velocity.
     """
 
-    def __init__(self, pos):
-        self.id = f'{uuid.uuid4()}'
+    def __init__(self, pos, receptors=None, resources=None, is_bad=None, velocity=None, color=None, agent_id=None):
+        """
+        Create an agent. Any attribute not given is drawn at random.
+
+        Passing every attribute skips the per-agent random draws; this is how
+        create_initial_agents builds large worlds from bulk samples.
+        """
+        self.id = f'{uuid.uuid4()}' if agent_id is None else agent_id
         self.pos = Vector3(pos)
-        self.receptors = self._generate_receptors()
-        self.resources = Resources()
+        self.receptors = self._generate_receptors() if receptors is None else receptors
+        self.resources = Resources() if resources is None else resources
         self.connected_agents = []
-        self.is_bad = random.random() < Consts.AGENT_CHANCE_OF_BEING_BAD  # chance of being a bad agent (strips resources from neighbors. can backfire.)
-        self.velocity = Vector3(random.uniform(-1, 1), 0, random.uniform(-1, 1)).normalize()
-        self.color = random.choice(list(Consts.AGENT_COLORS.keys()))
+        self.connection_version = 0
+        if is_bad is None:
+            is_bad = random.random() < Consts.AGENT_CHANCE_OF_BEING_BAD  # chance of being a bad agent (strips resources from neighbors. can backfire.)
+        self.is_bad = is_bad
+        if velocity is None:
+            velocity = Vector3(random.uniform(-1, 1), 0, random.uniform(-1, 1)).normalize()
+        self.velocity = Vector3(velocity)
+        self.color = random.choice(list(Consts.AGENT_COLORS.keys())) if color is None else color
         self.color_rgb = Consts.AGENT_COLORS[self.color]
         self.is_alive = True
 
@@ -133,6 +147,7 @@ class Agent:
         """
         for connected_agent in self.connected_agents:
             connected_agent.connected_agents.remove(self)
+            connected_agent.connection_version += 1
             for connected_receptor in connected_agent.receptors:
                 id = connected_receptor.id
                 for receptor in self.receptors:
@@ -144,6 +159,7 @@ class Agent:
         
         self.receptors.clear()
         self.connected_agents.clear()
+        self.connection_version += 1
         self.is_alive = False
         
     def flash_x_times(self, x):
@@ -160,50 +176,50 @@ class Agent:
         """
         Draw the agent as a cube in the 3D world.
         """
-        glDisable(GL_LIGHTING)  # Disable lighting for the cube
-        glPushMatrix()
-        glTranslatef(self.pos.x, self.pos.y, self.pos.z)
+        GL.glDisable(GL.GL_LIGHTING)  # Disable lighting for the cube
+        GL.glPushMatrix()
+        GL.glTranslatef(self.pos.x, self.pos.y, self.pos.z)
         
         # Draw a cube to represent the agent
         r = self.color_rgb[0]
         g = self.color_rgb[1]
         b = self.color_rgb[2]
-        glColor3f(r, g, b)  # Set the color
-        glBegin(GL_QUADS)
+        GL.glColor3f(r, g, b)  # Set the color
+        GL.glBegin(GL.GL_QUADS)
         # Front face
-        glVertex3f(-0.5, -0.5, 0.5)
-        glVertex3f(0.5, -0.5, 0.5)
-        glVertex3f(0.5, 0.5, 0.5)
-        glVertex3f(-0.5, 0.5, 0.5)
+        GL.glVertex3f(-0.5, -0.5, 0.5)
+        GL.glVertex3f(0.5, -0.5, 0.5)
+        GL.glVertex3f(0.5, 0.5, 0.5)
+        GL.glVertex3f(-0.5, 0.5, 0.5)
         # Back face
-        glVertex3f(-0.5, -0.5, -0.5)
-        glVertex3f(-0.5, 0.5, -0.5)
-        glVertex3f(0.5, 0.5, -0.5)
-        glVertex3f(0.5, -0.5, -0.5)
+        GL.glVertex3f(-0.5, -0.5, -0.5)
+        GL.glVertex3f(-0.5, 0.5, -0.5)
+        GL.glVertex3f(0.5, 0.5, -0.5)
+        GL.glVertex3f(0.5, -0.5, -0.5)
         # Top face
-        glVertex3f(-0.5, 0.5, -0.5)
-        glVertex3f(-0.5, 0.5, 0.5)
-        glVertex3f(0.5, 0.5, 0.5)
-        glVertex3f(0.5, 0.5, -0.5)
+        GL.glVertex3f(-0.5, 0.5, -0.5)
+        GL.glVertex3f(-0.5, 0.5, 0.5)
+        GL.glVertex3f(0.5, 0.5, 0.5)
+        GL.glVertex3f(0.5, 0.5, -0.5)
         # Bottom face
-        glVertex3f(-0.5, -0.5, -0.5)
-        glVertex3f(0.5, -0.5, -0.5)
-        glVertex3f(0.5, -0.5, 0.5)
-        glVertex3f(-0.5, -0.5, 0.5)
+        GL.glVertex3f(-0.5, -0.5, -0.5)
+        GL.glVertex3f(0.5, -0.5, -0.5)
+        GL.glVertex3f(0.5, -0.5, 0.5)
+        GL.glVertex3f(-0.5, -0.5, 0.5)
         # Right face
-        glVertex3f(0.5, -0.5, -0.5)
-        glVertex3f(0.5, 0.5, -0.5)
-        glVertex3f(0.5, 0.5, 0.5)
-        glVertex3f(0.5, -0.5, 0.5)
+        GL.glVertex3f(0.5, -0.5, -0.5)
+        GL.glVertex3f(0.5, 0.5, -0.5)
+        GL.glVertex3f(0.5, 0.5, 0.5)
+        GL.glVertex3f(0.5, -0.5, 0.5)
         # Left face
-        glVertex3f(-0.5, -0.5, -0.5)
-        glVertex3f(-0.5, -0.5, 0.5)
-        glVertex3f(-0.5, 0.5, 0.5)
-        glVertex3f(-0.5, 0.5, -0.5)
-        glEnd()
+        GL.glVertex3f(-0.5, -0.5, -0.5)
+        GL.glVertex3f(-0.5, -0.5, 0.5)
+        GL.glVertex3f(-0.5, 0.5, 0.5)
+        GL.glVertex3f(-0.5, 0.5, -0.5)
+        GL.glEnd()
         
-        glPopMatrix()
-        glEnable(GL_LIGHTING)
+        GL.glPopMatrix()
+        GL.glEnable(GL.GL_LIGHTING)
 
     def connect_if_possible(self, other_agent):
         """
@@ -234,18 +250,29 @@ class Agent:
                         other_receptor.connected_receptor_id = receptor.id
                         self.connected_agents.append(other_agent)
                         other_agent.connected_agents.append(self)
+                        self.connection_version += 1
+                        other_agent.connection_version += 1
                         break
                     
 
-    def draw_connections(self):
+    def draw_connections(self, max_lines=None):
         """
         Draw connections to other agents.
+
+        Args:
+            max_lines (int, optional): Most lines to draw. All are drawn if None.
+
+        Returns:
+            int: Number of lines drawn.
         """
-        glColor3f(1.0, 1.0, 0.0)  # Yellow color for connections
-        glLineWidth(2.0)
-        glBegin(GL_LINES)
+        GL.glColor3f(1.0, 1.0, 0.0)  # Yellow color for connections
+        GL.glLineWidth(2.0)
+        GL.glBegin(GL.GL_LINES)
         
+        lines = 0
         for connected_agent in self.connected_agents:
+            if max_lines is not None and lines >= max_lines:
+                break
             direction = connected_agent.pos - self.pos
             distance = direction.length()
             
@@ -265,7 +292,9 @@ class Agent:
                 end_x = self.pos.x + connection_length * math.cos(math.radians(adjusted_angle))
                 end_z = self.pos.z + connection_length * math.sin(math.radians(adjusted_angle))
                 
-                glVertex3f(self.pos.x, self.pos.y, self.pos.z)
-                glVertex3f(end_x, self.pos.y, end_z)
+                GL.glVertex3f(self.pos.x, self.pos.y, self.pos.z)
+                GL.glVertex3f(end_x, self.pos.y, end_z)
+                lines += 1
         
-        glEnd()
\ No newline at end of file
+        GL.glEnd()
+        return lines
\ No newline at end of file
@@ -9,6 +9,7 @@ class Resources:
     Attributes:
         types (list): List of available resource types.
         amount (dict): Dictionary holding the amount of each resource type.
+        total (float): Sum of all amounts, kept up to date by generate() and metabolize().
 
     Methods:
         generate(self, resource_type, amount)
@@ -19,8 +20,11 @@ class Resources:
     TYPES = ["sugar", "spice", "grain", "water", "oil"]
     _MAX_RESOURCE = Consts.MAX_AMOUNT_OF_ANY_RESOURCE
 
-    def __init__(self):
-        self.amount = {resource_type: random.uniform(5.0, self._MAX_RESOURCE) for resource_type in self.TYPES}
+    def __init__(self, amount=None):
+        if amount is None:
+            amount = {resource_type: random.uniform(5.0, self._MAX_RESOURCE) for resource_type in self.TYPES}
+        self.amount = amount
+        self.total = sum(amount.values())
 
     def generate(self, resource_type, amount):
         """
@@ -31,8 +35,9 @@ class Resources:
             amount (float): The amount of resource to generate.
         """
         if resource_type in self.TYPES:
-            self.amount[resource_type] += amount
-            self.amount[resource_type] = min(self._MAX_RESOURCE, self.amount[resource_type])
+            old_amount = self.amount[resource_type]
+            self.amount[resource_type] = min(self._MAX_RESOURCE, old_amount + amount)
+            self.total += self.amount[resource_type] - old_amount
 
     def metabolize(self, resource_type, amount):
         """
@@ -46,8 +51,9 @@ class Resources:
             bool: True if there was enough resource to metabolize, False otherwise.
         """
         if resource_type in self.TYPES:
-            self.amount[resource_type] -= amount
-            self.amount[resource_type] = max(0.0, self.amount[resource_type])
+            old_amount = self.amount[resource_type]
+            self.amount[resource_type] = max(0.0, old_amount - amount)
+            self.total += self.amount[resource_type] - old_amount
             return True
         return False
 
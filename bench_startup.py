@@ -0,0 +1,91 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+def measure_import_time(module, repeat):
+    """
+    Measure how long a fresh interpreter takes to import a module.
+
+    Args:
+        module (str): Module to import.
+        repeat (int): Number of runs; the fastest is reported.
+
+    Returns:
+        float: Import time in seconds, net of interpreter startup.
+    """
+    def run(code):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL,
+                           cwd=os.path.dirname(os.path.abspath(__file__)))
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    return run(f"import {module}") - run("pass")
+
+def time_build(num_agents):
+    """
+    Time building a world.
+
+    Returns:
+        tuple: (agents, seconds).
+    """
+    import open_world
+
+    start = time.perf_counter()
+    agents = open_world.create_initial_agents(num_agents)
+    return agents, time.perf_counter() - start
+
+def time_first_step(agents):
+    """
+    Time the first simulation step of a freshly built world.
+
+    Returns:
+        float: Seconds taken by the step.
+    """
+    import open_world
+
+    start = time.perf_counter()
+    world_index = open_world.WorldIndex()
+    world_index.refresh(agents)
+    open_world.check_and_create_connections(agents, world_index)
+    open_world.update_agents(agents, 1 / 60)
+    return time.perf_counter() - start
+
+def main():
+    """
+    Report import time, world construction time and time to first simulation step.
+
+    Construction and the first step are measured on separate worlds. The
+    field has a fixed radius, so the first step's connection search grows
+    with the square of the population; at the default build size it would
+    take far longer than the build itself.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark open_world startup.")
+    parser.add_argument("--agents", type=int, default=1_000_000, help="number of agents in the build run")
+    parser.add_argument("--step-agents", type=int, default=20_000, help="number of agents in the first-step run")
+    parser.add_argument("--repeat", type=int, default=5, help="import timing runs (fastest is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"import open_world:   {measure_import_time('open_world', args.repeat) * 1000:8.1f} ms")
+    print(f"import OpenGL.GL:    {measure_import_time('OpenGL.GL', args.repeat) * 1000:8.1f} ms")
+
+    random.seed(args.seed)
+    agents, build_time = time_build(args.agents)
+    print(f"build {args.agents} agents: {build_time:8.2f} s")
+    del agents
+
+    random.seed(args.seed)
+    agents, build_time = time_build(args.step_agents)
+    step_time = time_first_step(agents)
+    print(f"build {args.step_agents} agents: {build_time:8.2f} s")
+    print(f"first step, {args.step_agents} agents: {step_time:8.2f} s")
+    print(f"time to first step, {args.step_agents} agents: {build_time + step_time:8.2f} s")
+
+if __name__ == "__main__":
+    main()
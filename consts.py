@@ -7,6 +7,31 @@ class Consts:
     MIN_DISTANCE_BETWEEN_AGENTS_FOR_CONNECTION = 2  # Minimum distance between agents for connection
     MAX_AMOUNT_OF_ANY_RESOURCE = 15
 
+    UPLOAD_PBO_COUNT = 2  # Pixel buffer objects in the dashboard upload ring
+    CAPTURE_PBO_COUNT = 3  # Pixel buffer objects in the frame readback ring
+    CAPTURE_QUEUE_SIZE = 8  # Frames waiting for the encoder before new ones are dropped
+    CAPTURE_MODE = "png"  # "png" for a PNG sequence, "video" for an mp4 through ffmpeg
+    CAPTURE_OUTPUT_DIR = "captures"
+    CAPTURE_FPS = 60
+    CAPTURE_PNG_COMPRESSION = 1  # zlib level for PNG frames; higher levels write smaller files but drop more frames
+
+    INSPECT_SERVER_ENABLED = False  # Stream world deltas to remote viewers
+    INSPECT_SERVER_HOST = "127.0.0.1"
+    INSPECT_SERVER_PORT = 8765
+    INSPECT_CLIENT_QUEUE_FRAMES = 4  # Frames queued per viewer before it is resynced with a key frame
+    INSPECT_POSITION_EPSILON = 1e-3  # Smallest position change that is sent
+
+    GOVERNOR_ENABLED = True  # Trade rendering and search quality for frame rate under load
+    GOVERNOR_TARGET_FRAME_TIME = 1 / 60  # Seconds of work per frame the governor aims for
+    GOVERNOR_ADJUST_INTERVAL = 30  # Frames between quality changes
+    GOVERNOR_RELAX_FRACTION = 0.5  # Restore quality once frames take less than this share of the budget
+    GOVERNOR_MIN_RELIEF_FRACTION = 0.25  # When the budget is out of reach, only degrade stages costing this share of the frame
+    GOVERNOR_MAX_DASHBOARD_INTERVAL = 32
+    GOVERNOR_MAX_CONNECTION_SLICES = 16
+    GOVERNOR_MAX_SIM_TICKS_PER_DRAW = 4
+    GOVERNOR_MAX_CONNECTION_LINES = 4000  # First cap on connection lines drawn, halved on each further step
+    GOVERNOR_MIN_CONNECTION_LINES = 250
+
     AGENT_COLORS = {
         "red": (255, 0, 0),
         "green": (0, 255, 0),
@@ -4,32 +4,40 @@ class Dashboard:
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.surface = pygame.Surface((width, height))
+        self.surface = pygame.Surface((width, height), 0, 32)  # 32 bpp so it can be uploaded as BGRA without conversion
         self.font = pygame.font.Font(None, 24)
         self.scroll_position = 0
         self.agents_per_page = 20
         self.bar_padding = 10
         self.fixed_column_width = 80  # Width of the fixed column, reduced since we're not showing ID
 
-    def update(self, agents):
+    def update(self, agents, index=None):
         self.surface.fill((0, 0, 0))  # Clear the surface
         
-        # Sort agents by health (least healthy first)
-        sorted_agents = sorted(agents, key=lambda x: sum(x.resources.get_resource_levels().values()))
-        
         start = self.scroll_position
-        end = min(start + self.agents_per_page, len(sorted_agents))
+        
+        if index is not None:
+            # The index keeps agents ordered by health, so only the visible page is read
+            end = min(start + self.agents_per_page, len(index))
+            page_agents = index.poorest(end)[start:end]
+            richest = index.richest(1)
+            max_health = index.total_resources(richest[0]) if richest else 1
+        else:
+            # Sort agents by health (least healthy first)
+            sorted_agents = sorted(agents, key=lambda x: sum(x.resources.get_resource_levels().values()))
+            end = min(start + self.agents_per_page, len(sorted_agents))
+            page_agents = sorted_agents[start:end]
+            max_health = max(sum(agent.resources.get_resource_levels().values()) for agent in sorted_agents) if sorted_agents else 1
         
         available_width = self.width - self.fixed_column_width - (self.agents_per_page + 1) * self.bar_padding
         bar_width = available_width // self.agents_per_page
-        max_health = max(sum(agent.resources.get_resource_levels().values()) for agent in sorted_agents) if sorted_agents else 1
         
         # Draw fixed column
         pygame.draw.rect(self.surface, (50, 50, 50), (0, 0, self.fixed_column_width, self.height))
         conn_text = self.font.render("Conn:", True, (255, 255, 255))
         self.surface.blit(conn_text, (10, self.height - 20))
         
-        for i, agent in enumerate(sorted_agents[start:end]):
+        for i, agent in enumerate(page_agents):
             health = sum(agent.resources.get_resource_levels().values())
             bar_height = int((health / max_health) * (self.height - 40))
             
@@ -0,0 +1,244 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from consts import Consts
+
+logger = logging.getLogger(__name__)
+
+class QualityGovernor:
+    """
+    Adjusts rendering and simulation quality to hold a target frame time.
+
+    The main loop wraps each stage of a frame in stage() and calls end_frame()
+    once per frame. The governor keeps a moving average of the cost of every
+    stage. When the frame is over budget it degrades the setting that relieves
+    the most expensive stage; when the frame is comfortably under budget it
+    undoes its most recent degradation. Every decision is logged.
+
+    Draw stages only run on frames that are drawn, so their averages are
+    taken over drawn frames only and divided by sim_ticks_per_draw to get
+    their cost per frame.
+
+    Each degradation records the cost of the stage it relieved, before and
+    after the change. A degradation is only undone if the frame time plus
+    the cost it saved, scaled to the stage's current load, stays under the
+    relax threshold; otherwise undoing it would just put the frame back
+    over budget.
+
+    When the stages the remaining settings relieve are too cheap to bring
+    the frame under budget, e.g. because the simulation alone takes longer
+    than the target, only a setting that relieves a large share of the
+    frame is degraded; if there is none the governor logs which stage it
+    cannot relieve instead. sim_ticks_per_draw is never raised while the
+    stages outside the draw stages exceed the target, since drawing less
+    often cannot make up for them and only lowers the rendered frame rate.
+
+    Stages and the settings that relieve them, in the order they are tried:
+        connections       connection_slices (search a rotating slice of agents per frame)
+        agents            point_sprites, then sim_ticks_per_draw
+        connection_lines  max_connection_lines, then sim_ticks_per_draw
+        dashboard         dashboard_interval (rebuild the dashboard every N frames)
+    Other stages (e.g. "simulation") are measured but have no setting of their own.
+    The draw stages are agents, connection_lines, dashboard and capture.
+
+    Attributes:
+        enabled (bool): Whether settings are adjusted; costs are measured either way.
+        target_frame_time (float): Frame time budget in seconds.
+        dashboard_interval (int): Rebuild the dashboard every this many frames.
+        point_sprites (bool): Draw agents as points instead of cubes.
+        max_connection_lines (int or None): Most connection lines drawn per frame, None for all.
+        connection_slices (int): Number of frames a full connection search is spread over.
+        sim_ticks_per_draw (int): Simulation ticks per rendered frame.
+        frame (int): Number of frames ended so far.
+    """
+
+    _RELIEF = {
+        "connections": ["connection_slices"],
+        "agents": ["point_sprites", "sim_ticks_per_draw"],
+        "connection_lines": ["max_connection_lines", "sim_ticks_per_draw"],
+        "dashboard": ["dashboard_interval"],
+    }
+    _DRAW_STAGES = frozenset({"agents", "connection_lines", "dashboard", "capture"})
+
+    def __init__(self, target_frame_time=Consts.GOVERNOR_TARGET_FRAME_TIME,
+                 adjust_interval=Consts.GOVERNOR_ADJUST_INTERVAL, smoothing=0.1,
+                 enabled=Consts.GOVERNOR_ENABLED):
+        self.enabled = enabled
+        self.target_frame_time = target_frame_time
+        self.adjust_interval = adjust_interval
+        self.smoothing = smoothing
+
+        self.dashboard_interval = 1
+        self.point_sprites = False
+        self.max_connection_lines = None
+        self.connection_slices = 1
+        self.sim_ticks_per_draw = 1
+
+        self.frame = 0
+        self._frame_costs = {}
+        self._average_costs = {}
+        self._frames_since_change = 0
+        self._changes = []  # [setting, previous value, stage, cost before, cost after], most recent last
+        self._cannot_relieve = None  # stage last reported as the obstacle, to log it once
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a stage of the current frame.
+
+        Args:
+            name (str): Stage name; a stage may be entered several times per frame.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._frame_costs[name] = self._frame_costs.get(name, 0.0) + time.perf_counter() - start
+
+    @property
+    def frame_time(self):
+        """
+        float: Moving average of the measured work per frame, in seconds.
+        """
+        return sum(self._stage_costs().values())
+
+    def _stage_costs(self):
+        """
+        Get the average cost per frame of every stage, with draw stages
+        spread over the simulation ticks of each drawn frame.
+        """
+        return {
+            name: cost / self.sim_ticks_per_draw if name in self._DRAW_STAGES else cost
+            for name, cost in self._average_costs.items()
+        }
+
+    def _relieved_cost(self, setting, stage):
+        """
+        Get the current cost per frame of what a setting relieves.
+        sim_ticks_per_draw relieves all draw stages at once.
+        """
+        costs = self._stage_costs()
+        if setting == "sim_ticks_per_draw":
+            return sum(cost for name, cost in costs.items() if name in self._DRAW_STAGES)
+        return costs.get(stage, 0.0)
+
+    def is_dashboard_frame(self):
+        return self.frame % self.dashboard_interval == 0
+
+    def is_draw_frame(self):
+        return self.frame % self.sim_ticks_per_draw == 0
+
+    def connection_slice(self):
+        """
+        Get the slice of agents the connection search should cover this frame.
+
+        Returns:
+            tuple: (slice index, slice count).
+        """
+        return (self.frame % self.connection_slices, self.connection_slices)
+
+    def end_frame(self):
+        """
+        Record the stage costs of the frame and adjust the settings if needed.
+        """
+        drawn = self.is_draw_frame()
+        for name in self._average_costs.keys() | self._frame_costs.keys():
+            if name in self._DRAW_STAGES and not drawn:
+                continue
+            cost = self._frame_costs.get(name, 0.0)
+            average = self._average_costs.get(name)
+            self._average_costs[name] = cost if average is None else average + self.smoothing * (cost - average)
+        self._frame_costs = {}
+        self.frame += 1
+        self._frames_since_change += 1
+
+        if not self.enabled or self._frames_since_change < self.adjust_interval:
+            return
+        if self._changes and self._changes[-1][4] is None:
+            change = self._changes[-1]
+            change[4] = self._relieved_cost(change[0], change[2])
+        frame_time = self.frame_time
+        if frame_time > self.target_frame_time:
+            self._degrade()
+        elif frame_time < self.target_frame_time * Consts.GOVERNOR_RELAX_FRACTION and self._changes:
+            self._relax()
+
+    def _next_value(self, setting):
+        """
+        Get the next lower-quality value of a setting.
+
+        Returns:
+            The new value, or None if the setting cannot be degraded further.
+        """
+        value = getattr(self, setting)
+        if setting == "point_sprites":
+            return None if value else True
+        if setting == "max_connection_lines":
+            if value is None:
+                return Consts.GOVERNOR_MAX_CONNECTION_LINES
+            return value // 2 if value // 2 >= Consts.GOVERNOR_MIN_CONNECTION_LINES else None
+        limits = {
+            "dashboard_interval": Consts.GOVERNOR_MAX_DASHBOARD_INTERVAL,
+            "connection_slices": Consts.GOVERNOR_MAX_CONNECTION_SLICES,
+            "sim_ticks_per_draw": Consts.GOVERNOR_MAX_SIM_TICKS_PER_DRAW,
+        }
+        return value * 2 if value * 2 <= limits[setting] else None
+
+    def _degrade(self):
+        costs = self._stage_costs()
+        outside_draw_cost = sum(cost for name, cost in costs.items() if name not in self._DRAW_STAGES)
+        options = []  # (stage, cost, setting, value), most expensive stage first
+        for stage, cost in sorted(costs.items(), key=lambda item: item[1], reverse=True):
+            for setting in self._RELIEF.get(stage, ()):
+                if setting == "sim_ticks_per_draw" and outside_draw_cost >= self.target_frame_time:
+                    continue
+                value = self._next_value(setting)
+                if value is not None:
+                    options.append((stage, cost, setting, value))
+
+        relievable = {stage for stage, _, _, _ in options}
+        if any(setting == "sim_ticks_per_draw" for _, _, setting, _ in options):
+            relievable |= self._DRAW_STAGES
+        relievable_cost = sum(cost for name, cost in costs.items() if name in relievable)
+        frame_time = self.frame_time
+        if frame_time - relievable_cost > self.target_frame_time:
+            # The budget is out of reach; only changes that save a large share of the frame are worth it
+            options = [option for option in options
+                       if self._relieved_cost(option[2], option[0]) >= frame_time * Consts.GOVERNOR_MIN_RELIEF_FRACTION]
+        if not options:
+            stage = max((name for name in costs if name not in relievable), key=costs.get)
+            if stage != self._cannot_relieve:
+                self._cannot_relieve = stage
+                logger.info("over budget, cannot relieve %s: it costs %.1f ms, the remaining settings "
+                            "can save at most %.1f ms (frame %s)",
+                            stage, costs[stage] * 1000, relievable_cost * 1000, self._describe_costs())
+            return
+
+        stage, cost, setting, value = options[0]
+        self._changes.append([setting, getattr(self, setting), stage, self._relieved_cost(setting, stage), None])
+        self._apply(setting, value, f"over budget, {stage} costs {cost * 1000:.1f} ms")
+
+    def _relax(self):
+        setting, value, stage, cost_before, cost_after = self._changes[-1]
+        cost_now = self._relieved_cost(setting, stage)
+        # Scale the cost saved at the time of the change to the stage's current load
+        saved = cost_before - cost_after
+        if cost_after > 0:
+            saved *= cost_now / cost_after
+        if self.frame_time + max(0.0, saved) >= self.target_frame_time * Consts.GOVERNOR_RELAX_FRACTION:
+            return
+        self._changes.pop()
+        self._apply(setting, value, f"under budget, {setting} saves an estimated {saved * 1000:.1f} ms")
+
+    def _describe_costs(self):
+        return "%.1f ms of %.1f ms; %s" % (
+            self.frame_time * 1000, self.target_frame_time * 1000,
+            ", ".join(f"{name} {cost * 1000:.1f}" for name, cost in sorted(self._stage_costs().items())))
+
+    def _apply(self, setting, value, reason):
+        logger.info("%s: %s %s -> %s (frame %s)", reason, setting, getattr(self, setting), value,
+                    self._describe_costs())
+        setattr(self, setting, value)
+        self._frames_since_change = 0
+        self._cannot_relieve = None
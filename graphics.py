@@ -11,6 +11,23 @@ def setup_lighting():
     glLightfv(GL_LIGHT0, GL_AMBIENT, (0.5, 0.5, 0.5, 1))
     glLightfv(GL_LIGHT0, GL_DIFFUSE, (1, 1, 1, 1))
 
+def draw_agents_as_points(agents, size=4.0):
+    """
+    Draw all agents as points in a single batch, a cheaper stand-in for their cubes.
+
+    Args:
+        agents (list): List of agents to draw.
+        size (float): Point size in pixels.
+    """
+    glDisable(GL_LIGHTING)
+    glPointSize(size)
+    glBegin(GL_POINTS)
+    for agent in agents:
+        glColor3f(*agent.color_rgb)
+        glVertex3f(agent.pos.x, agent.pos.y, agent.pos.z)
+    glEnd()
+    glEnable(GL_LIGHTING)
+
 def render_text(text, x, y):
     """
     Render text on the screen using Pygame.
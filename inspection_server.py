@@ -0,0 +1,354 @@
+import asyncio
+import struct
+import threading
+
+import numpy as np
+
+from consts import Consts
+
+# Frame layout (little endian), sent over TCP with a u32 length prefix:
+#   header   magic "OW", version u8, kind u8, tick u32,
+#            spawn/move/edge add/edge remove/death counts u32 x5
+#   stats    alive u32, bad u32, edges u32, mean resources f32, min resources f32
+#   spawns   handles u32[n], colors u8[n, 3], is_bad u8[n]
+#   moves    handles u32[n], positions f32[n, 3]
+#   edges    added u32[n, 2], removed u32[n, 2]
+#   deaths   handles u32[n]
+# Agents are referred to by small integer handles assigned on spawn. A key
+# frame spawns every live agent and adds every edge, so it can be applied to
+# an empty world.
+FRAME_MAGIC = b"OW"
+FRAME_VERSION = 1
+FRAME_DELTA = 0
+FRAME_KEY = 1
+
+_HEADER = struct.Struct("<2sBBIIIIII")
+_STATS = struct.Struct("<IIIff")
+_LENGTH = struct.Struct("<I")
+
+
+def _encode_frame(kind, tick, stats, spawns, moves, added_edges, removed_edges, deaths):
+    """
+    Encode one frame.
+
+    Args:
+        kind (int): FRAME_DELTA or FRAME_KEY.
+        tick (int): Simulation tick the frame describes.
+        stats (tuple): (alive, bad, edges, mean resources, min resources).
+        spawns (list): (handle, (r, g, b), is_bad) of new agents.
+        moves (list): (handle, (x, y, z)) of agents that moved.
+        added_edges (list): (handle, handle) of new connections.
+        removed_edges (list): (handle, handle) of broken connections.
+        deaths (list): Handles of agents that died.
+
+    Returns:
+        bytes: The encoded frame, without the length prefix.
+    """
+    parts = [
+        _HEADER.pack(FRAME_MAGIC, FRAME_VERSION, kind, tick,
+                     len(spawns), len(moves), len(added_edges), len(removed_edges), len(deaths)),
+        _STATS.pack(*stats),
+    ]
+    if spawns:
+        parts.append(np.array([s[0] for s in spawns], dtype="<u4").tobytes())
+        parts.append(np.clip(np.array([s[1] for s in spawns]), 0, 255).astype(np.uint8).tobytes())
+        parts.append(np.array([s[2] for s in spawns], dtype=np.uint8).tobytes())
+    if moves:
+        parts.append(np.array([m[0] for m in moves], dtype="<u4").tobytes())
+        parts.append(np.array([m[1] for m in moves], dtype="<f4").tobytes())
+    if added_edges:
+        parts.append(np.array(added_edges, dtype="<u4").tobytes())
+    if removed_edges:
+        parts.append(np.array(removed_edges, dtype="<u4").tobytes())
+    if deaths:
+        parts.append(np.array(deaths, dtype="<u4").tobytes())
+    return b"".join(parts)
+
+
+def decode_frame(data):
+    """
+    Decode a frame produced by the inspection server.
+
+    Args:
+        data (bytes): The frame, without the length prefix.
+
+    Returns:
+        dict: The frame fields, with numpy arrays for the per-agent sections.
+    """
+    magic, version, kind, tick, n_spawns, n_moves, n_added, n_removed, n_deaths = _HEADER.unpack_from(data, 0)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"Not an inspection frame (magic {magic!r}, version {version})")
+    offset = _HEADER.size
+    alive, bad, edges, mean_resources, min_resources = _STATS.unpack_from(data, offset)
+    offset += _STATS.size
+
+    def take(dtype, count, shape=()):
+        nonlocal offset
+        array = np.frombuffer(data, dtype=dtype, count=count * int(np.prod(shape, dtype=int)), offset=offset)
+        offset += array.nbytes
+        return array.reshape((count,) + shape)
+
+    return {
+        "kind": kind,
+        "tick": tick,
+        "stats": {
+            "alive": alive,
+            "bad": bad,
+            "edges": edges,
+            "mean_resources": mean_resources,
+            "min_resources": min_resources,
+        },
+        "spawn_handles": take("<u4", n_spawns),
+        "spawn_colors": take(np.uint8, n_spawns, (3,)),
+        "spawn_is_bad": take(np.uint8, n_spawns).astype(bool),
+        "move_handles": take("<u4", n_moves),
+        "move_positions": take("<f4", n_moves, (3,)),
+        "added_edges": take("<u4", n_added, (2,)),
+        "removed_edges": take("<u4", n_removed, (2,)),
+        "deaths": take("<u4", n_deaths),
+    }
+
+
+async def read_frame(reader):
+    """
+    Read the next frame from a connection to the inspection server.
+
+    Args:
+        reader (asyncio.StreamReader): Reader of the connection.
+
+    Returns:
+        dict: The decoded frame (see decode_frame).
+    """
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return decode_frame(await reader.readexactly(length))
+
+
+class _Client:
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.needs_key_frame = True
+        self.skipped_frames = 0
+        self.task = asyncio.current_task()
+
+
+class InspectionServer:
+    """
+    Streams per-tick world deltas to remote viewers over TCP.
+
+    The server runs its own asyncio loop on a background thread. The
+    simulation calls publish() once per tick; it diffs the agents against the
+    previous tick on the simulation thread, encodes a single delta frame and
+    hands it to the loop without waiting. Every client has a small frame
+    queue. A client whose queue is full has its pending frames dropped and
+    resumes from the next key frame, so a slow viewer can never hold up the
+    simulation or the other viewers.
+
+    Attributes:
+        host (str): Interface the server listens on.
+        port (int): Port the server listens on (the bound port once started).
+    """
+
+    def __init__(self, host=Consts.INSPECT_SERVER_HOST, port=Consts.INSPECT_SERVER_PORT,
+                 queue_size=Consts.INSPECT_CLIENT_QUEUE_FRAMES):
+        self.host = host
+        self.port = port
+        self._queue_size = queue_size
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._clients = set()
+        self._started = threading.Event()
+        self._start_error = None
+        self._key_frame_requested = False
+
+        # Mirror of the world as last published, owned by the simulation thread
+        self._handles = {}
+        self._next_handle = 0
+        self._looks = {}
+        self._positions = {}
+        self._edges = set()
+
+    def start(self):
+        """
+        Start listening on a background thread. Returns once the server is bound.
+        """
+        self._thread = threading.Thread(target=self._run, name="inspection-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            raise self._start_error
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port))
+        except OSError as e:
+            self._start_error = e
+            self._loop.close()
+            self._loop = None
+            self._started.set()
+            return
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def stop(self):
+        """
+        Disconnect all clients and stop the server thread.
+        """
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            tasks = [client.task for client in self._clients]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._server.wait_closed()
+            self._loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop)
+        self._thread.join()
+        self._loop = None
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def publish(self, agents, tick):
+        """
+        Send the changes since the previous tick to all connected clients.
+
+        Does nothing while no client is connected. Never blocks on the network.
+
+        Args:
+            agents (list): List of all agents in the simulation.
+            tick (int): Current simulation tick.
+        """
+        if self._loop is None:
+            return
+        if not self._clients:
+            self._reset_mirror()
+            return
+
+        spawns = []
+        moves = []
+        positions = {}
+        bad = 0
+        min_resources = float("inf")
+        sum_resources = 0.0
+        epsilon = Consts.INSPECT_POSITION_EPSILON
+        live_agents = [agent for agent in agents if agent.is_alive]
+
+        for agent in live_agents:
+            handle = self._handles.get(agent.id)
+            if handle is None:
+                handle = self._handles[agent.id] = self._next_handle
+                self._next_handle += 1
+                self._looks[handle] = (agent.color_rgb, agent.is_bad)
+                spawns.append((handle, agent.color_rgb, agent.is_bad))
+
+            pos = (agent.pos.x, agent.pos.y, agent.pos.z)
+            old_pos = self._positions.get(handle)
+            if old_pos is None or max(abs(a - b) for a, b in zip(pos, old_pos)) > epsilon:
+                positions[handle] = pos
+                moves.append((handle, pos))
+            else:
+                positions[handle] = old_pos  # so slow drift still adds up past epsilon
+
+            bad += agent.is_bad
+            total = sum(agent.resources.get_resource_levels().values())
+            sum_resources += total
+            min_resources = min(min_resources, total)
+
+        # Connections are mutual, so each edge is recorded from its higher handle
+        edges = set()
+        for agent in live_agents:
+            handle = self._handles[agent.id]
+            for connected_agent in agent.connected_agents:
+                other = self._handles.get(connected_agent.id)
+                if other is not None and other < handle:
+                    edges.add((other, handle))
+
+        deaths = [handle for handle in self._positions if handle not in positions]
+        if deaths:
+            dead = set(deaths)
+            self._handles = {agent_id: h for agent_id, h in self._handles.items() if h not in dead}
+            for handle in deaths:
+                del self._looks[handle]
+        added_edges = sorted(edges - self._edges)
+        removed_edges = sorted(self._edges - edges)
+        self._positions = positions
+        self._edges = edges
+
+        alive = len(positions)
+        stats = (alive, bad, len(edges),
+                 sum_resources / alive if alive else 0.0,
+                 min_resources if alive else 0.0)
+        delta = _encode_frame(FRAME_DELTA, tick, stats, spawns, moves, added_edges, removed_edges, deaths)
+
+        key_frame = None
+        if self._key_frame_requested:
+            self._key_frame_requested = False
+            key_frame = _encode_frame(
+                FRAME_KEY, tick, stats,
+                [(handle, color, is_bad) for handle, (color, is_bad) in self._looks.items()],
+                list(positions.items()), sorted(edges), [], [])
+
+        self._loop.call_soon_threadsafe(self._broadcast, delta, key_frame)
+
+    def _reset_mirror(self):
+        self._handles.clear()
+        self._looks.clear()
+        self._positions.clear()
+        self._edges.clear()
+
+    def _broadcast(self, delta, key_frame):
+        """
+        Queue a frame for every client. Runs on the server loop.
+        """
+        for client in self._clients:
+            if client.needs_key_frame:
+                if key_frame is None:
+                    client.skipped_frames += 1
+                    self._key_frame_requested = True
+                    continue
+                frame = key_frame
+            else:
+                frame = delta
+
+            if client.queue.full():
+                # Too far behind: drop what is queued and resync from a key frame
+                while not client.queue.empty():
+                    client.queue.get_nowait()
+                    client.skipped_frames += 1
+                client.skipped_frames += 1
+                client.needs_key_frame = True
+                self._key_frame_requested = True
+                continue
+
+            client.queue.put_nowait(frame)
+            client.needs_key_frame = False
+
+    async def _handle_client(self, reader, writer):
+        client = _Client(writer, self._queue_size)
+        self._clients.add(client)
+        self._key_frame_requested = True
+        try:
+            while not writer.is_closing():
+                frame = await client.queue.get()
+                writer.write(_LENGTH.pack(len(frame)))
+                writer.write(frame)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(client)
+            writer.close()
@@ -0,0 +1,36 @@
+import importlib
+import sys
+import types
+
+class _LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Attributes are copied onto the stand-in as they are looked up, so later
+    accesses cost the same as on the module itself.
+    """
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self.__name__), attr)
+        setattr(self, attr, value)
+        return value
+
+def lazy_import(name):
+    """
+    Import a module lazily: it is only loaded on first attribute access.
+
+    Used for the rendering libraries, so that simulation-only code paths
+    (benchmarks, headless runs, tooling) neither pay for importing them nor
+    need them installed. Nothing, not even the parent packages of a dotted
+    name, is looked up until then; a missing module raises
+    ModuleNotFoundError at that point.
+
+    Args:
+        name (str): Fully qualified module name, e.g. "OpenGL.GL".
+
+    Returns:
+        module: The module, loaded on first use.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
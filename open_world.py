@@ -1,46 +1,146 @@
 import pygame
 from pygame.math import Vector3
-from OpenGL.GL import *
-from OpenGL.GLU import *
+import argparse
+import gc
+import logging
 import math
 import random
+import time
+import uuid
 import numpy as np
 
-from camera import Camera
 from agent import Agent
-from graphics import *
+from agent_resources import Resources
+from receptor import Receptor
 from consts import Consts
-from dashboard import Dashboard
+from world_query import WorldIndex
+from governor import QualityGovernor
+from lazy_imports import lazy_import
+
+# Rendering modules are only loaded when main() opens a window, so
+# run_headless() and benchmarks start without PyOpenGL
+GL = lazy_import("OpenGL.GL")
+
+logger = logging.getLogger(__name__)
 
 def create_initial_agents(num_agents):
     """
     Create initial set of agents within the circular field.
 
+    All random attributes (positions, velocities, receptor counts and angles,
+    colors, bad flags and resources) are drawn for the whole population at
+    once with numpy, then the agents are assembled from the samples. The
+    distributions match those Agent draws on its own. The numpy generator is
+    seeded from `random`, so random.seed() still makes the world reproducible.
+
     Args:
         num_agents (int): Number of agents to create.
 
     Returns:
         list: List of created Agent objects.
     """
+    if num_agents <= 0:
+        return []
+    rng = np.random.default_rng(random.getrandbits(64))
+
+    angle = rng.uniform(0, 2 * math.pi, num_agents)
+    radius = rng.uniform(0, Consts.AGENT_FIELD_RADIUS, num_agents)
+    xs = (Consts.AGENT_FIELD_CENTER[0] + radius * np.cos(angle)).tolist()
+    zs = (Consts.AGENT_FIELD_CENTER[2] + radius * np.sin(angle)).tolist()
+
+    velocity = rng.uniform(-1, 1, (num_agents, 2))
+    velocity_norm = np.hypot(velocity[:, 0], velocity[:, 1])
+    velocity_norm[velocity_norm == 0] = 1.0
+    velocity /= velocity_norm[:, None]
+    vxs = velocity[:, 0].tolist()
+    vzs = velocity[:, 1].tolist()
+
+    # Same as max(0, int(random.gauss(5, 3))) per agent
+    receptor_counts = np.maximum(rng.normal(5, 3, num_agents).astype(int), 0)
+    receptor_ends = np.cumsum(receptor_counts).tolist()
+    receptor_angles = rng.choice(Receptor.VALID_ANGLES, int(receptor_ends[-1])).tolist()
+
+    color_names = list(Consts.AGENT_COLORS.keys())
+    colors = [color_names[i] for i in rng.integers(len(color_names), size=num_agents).tolist()]
+    is_bad = (rng.random(num_agents) < Consts.AGENT_CHANCE_OF_BEING_BAD).tolist()
+    resource_amounts = rng.uniform(5.0, Consts.MAX_AMOUNT_OF_ANY_RESOURCE, (num_agents, len(Resources.TYPES))).tolist()
+
+    # One uuid for the whole batch keeps ids unique without a uuid4 per object
+    batch_id = str(uuid.uuid4())
     agents = []
-    for _ in range(num_agents):
-        angle = random.uniform(0, 2 * math.pi)
-        radius = random.uniform(0, Consts.AGENT_FIELD_RADIUS)
-        x = Consts.AGENT_FIELD_CENTER[0] + radius * math.cos(angle)
-        z = Consts.AGENT_FIELD_CENTER[2] + radius * math.sin(angle)
-        agents.append(Agent((x, 0, z)))
+    start = 0
+    # Nothing allocated here is garbage, so skip the collections that millions
+    # of new objects would otherwise keep triggering
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(num_agents):
+            end = receptor_ends[i]
+            receptors = [Receptor(receptor_angle, f'{batch_id}-r{j}')
+                         for j, receptor_angle in enumerate(receptor_angles[start:end], start)]
+            start = end
+            agents.append(Agent(
+                (xs[i], 0, zs[i]),
+                receptors=receptors,
+                resources=Resources(dict(zip(Resources.TYPES, resource_amounts[i]))),
+                is_bad=is_bad[i],
+                velocity=(vxs[i], 0, vzs[i]),
+                color=colors[i],
+                agent_id=f'{batch_id}-a{i}',
+            ))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
     return agents
 
-def check_and_create_connections(agents):
+def check_and_create_connections(agents, index=None, slice_index=0, slice_count=1):
     """
     Check for potential connections between agents and create them if possible.
 
+    With an index, only agents within connection range that have a free
+    receptor at a complementary angle are tried, instead of every pair.
+
+    The search can be spread over several frames: each call then only starts
+    from the agents whose position in the list falls in the given slice, and
+    calling it with every slice index in turn covers all pairs.
+
     Args:
         agents (list): List of all agents in the simulation.
+        index (WorldIndex, optional): Index refreshed with the current agents.
+        slice_index (int): Slice of agents to search from this call.
+        slice_count (int): Number of slices the search is spread over.
     """
-    for i, agent in enumerate(agents):
-        for other_agent in agents[i+1:]:
+    if index is None:
+        for i in range(slice_index, len(agents), slice_count):
+            agent = agents[i]
+            for other_agent in agents[i+1:]:
+                agent.connect_if_possible(other_agent)
+        return
+
+    order = {agent.id: i for i, agent in enumerate(agents)}
+    for i in range(slice_index, len(agents), slice_count):
+        agent = agents[i]
+        # connect_if_possible would turn down agents without a spare receptor
+        if len(agent.connected_agents) >= len(agent.receptors):
+            continue
+        wanted_angles = {90 - angle for angle in index.free_angles(agent)}
+        if not wanted_angles:
+            continue
+        # Keep the pair order of the full scan: each pair once, earlier agent first
+        candidates = [(order[other_agent.id], other_agent)
+                      for other_agent in index.agents_within(agent.pos, Consts.MIN_DISTANCE_BETWEEN_AGENTS_FOR_CONNECTION)
+                      if order.get(other_agent.id, -1) > i]
+        candidates.sort(key=lambda candidate: candidate[0])
+        for _, other_agent in candidates:
+            if len(agent.connected_agents) >= len(agent.receptors):
+                break
+            if wanted_angles.isdisjoint(index.free_angles(other_agent)):
+                continue
+            num_connections = len(agent.connected_agents)
             agent.connect_if_possible(other_agent)
+            if len(agent.connected_agents) != num_connections:
+                index.update_agent(agent)
+                index.update_agent(other_agent)
 
 def update_agents(agents, dt):
     """
@@ -54,7 +154,7 @@ def update_agents(agents, dt):
         list: Updated list of agents with dead ones removed.
     """
     i = 0
-    min_resources = np.inf
+    min_resources = math.inf
     while i < len(agents):
         agent = agents[i]
         agent.manage_resources()
@@ -72,10 +172,64 @@ def update_agents(agents, dt):
 
     return agents
 
+def run_headless(num_agents, ticks=None, tick_rate=60, server=None):
+    """
+    Run the simulation without a window, streaming it to remote viewers.
+
+    Nothing here touches pygame.display or OpenGL, so this can run on a
+    host without a display. Connect a viewer to the inspection server to
+    watch the run.
+
+    Args:
+        num_agents (int): Number of agents to start with.
+        ticks (int, optional): Number of ticks to run. Runs until interrupted if None.
+        tick_rate (float, optional): Ticks per second, like the window's frame cap.
+            Runs as fast as possible if None.
+        server (InspectionServer, optional): Started server to publish to. If None,
+            one is started on Consts.INSPECT_SERVER_HOST/PORT and stopped on return.
+    """
+    from inspection_server import InspectionServer
+
+    owns_server = server is None
+    if owns_server:
+        server = InspectionServer()
+        server.start()
+    logger.info("Inspection server listening on %s:%d", server.host, server.port)
+
+    agents = create_initial_agents(num_agents)
+    world_index = WorldIndex()
+    world_index.refresh(agents)
+    dt = 1.0 / (tick_rate or 60)
+    tick = 0
+    next_tick_time = time.perf_counter()
+    try:
+        while ticks is None or tick < ticks:
+            check_and_create_connections(agents, world_index)
+            agents = update_agents(agents, dt)
+            world_index.refresh(agents)
+            tick += 1
+            server.publish(agents, tick)
+
+            if tick_rate is not None:
+                next_tick_time += dt
+                delay = next_tick_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_tick_time = time.perf_counter()  # running behind, don't try to catch up
+    finally:
+        if owns_server:
+            server.stop()
+
 def main():
     """
     Main function to set up and run the 3D world simulation with multiple agents.
     """
+    from camera import Camera
+    from graphics import setup_lighting, draw_agents_as_points
+    from dashboard import Dashboard
+    from pixel_buffers import SurfaceUploader, start_frame_capture
+
     pygame.init()
     main_display = (800, 600)
     dashboard_display = (800, 200)
@@ -88,20 +242,34 @@ def main():
     camera = Camera()
     camera.update_projection()
     
-    # Create a separate surface for the dashboard
-    dashboard_surface = pygame.Surface(dashboard_display)
-    
     agents = create_initial_agents(50)  # Start with 50 agents
+    world_index = WorldIndex()
+    world_index.refresh(agents)
     
     setup_lighting()
     
     clock = pygame.time.Clock()
     
     dashboard = Dashboard(dashboard_display[0], dashboard_display[1])
+    dashboard_uploader = SurfaceUploader(dashboard_display[0], dashboard_display[1])
+    frame_capture = None
+    
+    inspection_server = None
+    if Consts.INSPECT_SERVER_ENABLED:
+        from inspection_server import InspectionServer
+        inspection_server = InspectionServer()
+        inspection_server.start()
+    tick = 0
+    
+    governor = QualityGovernor()
     
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if frame_capture is not None:
+                    frame_capture.close()
+                if inspection_server is not None:
+                    inspection_server.stop()
                 pygame.quit()
                 return
             elif event.type == pygame.KEYDOWN:
@@ -113,6 +281,16 @@ def main():
                     dashboard.scroll(-1, len(agents))
                 elif event.key == pygame.K_RIGHT:
                     dashboard.scroll(1, len(agents))
+                elif event.key == pygame.K_r:
+                    # Toggle recording of the window
+                    if frame_capture is None:
+                        try:
+                            frame_capture = start_frame_capture(main_display[0], total_height)
+                        except (RuntimeError, OSError) as e:
+                            logger.error("Could not start recording: %s", e)
+                    else:
+                        frame_capture.close()
+                        frame_capture = None
 
         keys = pygame.key.get_pressed()
         mods = pygame.key.get_mods()
@@ -136,62 +314,109 @@ def main():
         dt = clock.tick(60) / 1000.0  # Get time since last frame in seconds
         
         # Update and manage agents
-        check_and_create_connections(agents)
-        agents = update_agents(agents, dt)
+        with governor.stage("connections"):
+            slice_index, slice_count = governor.connection_slice()
+            check_and_create_connections(agents, world_index, slice_index, slice_count)
+        with governor.stage("simulation"):
+            agents = update_agents(agents, dt)
+            world_index.refresh(agents)
+            tick += 1
+        
+        # Stream the changes to remote viewers, if any are connected
+        if inspection_server is not None:
+            with governor.stage("inspection"):
+                inspection_server.publish(agents, tick)
+        
+        # Under heavy load several simulation ticks run per rendered frame
+        if not governor.is_draw_frame():
+            governor.end_frame()
+            continue
         
         # Render the main scene
-        glViewport(0, dashboard_display[1], main_display[0], main_display[1])
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        GL.glViewport(0, dashboard_display[1], main_display[0], main_display[1])
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
         
-        glPushMatrix()
+        GL.glPushMatrix()
         # Position and rotate the camera
-        glRotatef(-camera.rot_x, 1, 0, 0)
-        glRotatef(-camera.rot_y, 0, 1, 0)
+        GL.glRotatef(-camera.rot_x, 1, 0, 0)
+        GL.glRotatef(-camera.rot_y, 0, 1, 0)
         camera_pos = camera.get_position(Vector3(0, 0, 0))  # Assuming camera follows a point at (0,0,0)
-        glTranslatef(-camera_pos[0], -camera_pos[1], -camera_pos[2])
+        GL.glTranslatef(-camera_pos[0], -camera_pos[1], -camera_pos[2])
         
         # Draw all agents and their connections
-        for agent in agents:
-            agent.draw()
-        for agent in agents:
-            agent.draw_connections()
-        
-        glPopMatrix()
+        with governor.stage("agents"):
+            if governor.point_sprites:
+                draw_agents_as_points(agents)
+            else:
+                for agent in agents:
+                    agent.draw()
+        with governor.stage("connection_lines"):
+            lines_left = governor.max_connection_lines
+            for agent in agents:
+                if lines_left is None:
+                    agent.draw_connections()
+                elif lines_left > 0:
+                    lines_left -= agent.draw_connections(lines_left)
+                else:
+                    break
         
-        # Update and render the dashboard
-        dashboard.update(agents)
-        dashboard_surface.blit(dashboard.surface, (0, 0))
+        GL.glPopMatrix()
         
-        # Switch to 2D mode for drawing the dashboard
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        glOrtho(0, main_display[0], 0, total_height, -1, 1)
-        glMatrixMode(GL_MODELVIEW)
-        glPushMatrix()
-        glLoadIdentity()
+        with governor.stage("dashboard"):
+            # Update the dashboard and stream it to its texture
+            if governor.is_dashboard_frame():
+                dashboard.update(agents, world_index)
+                dashboard_uploader.upload(dashboard.surface)
+            
+            # Switch to 2D mode for drawing the dashboard
+            GL.glMatrixMode(GL.GL_PROJECTION)
+            GL.glPushMatrix()
+            GL.glLoadIdentity()
+            GL.glOrtho(0, main_display[0], 0, total_height, -1, 1)
+            GL.glMatrixMode(GL.GL_MODELVIEW)
+            GL.glPushMatrix()
+            GL.glLoadIdentity()
+            
+            # Disable depth testing and lighting for 2D rendering
+            GL.glDisable(GL.GL_DEPTH_TEST)
+            GL.glDisable(GL.GL_LIGHTING)
+            
+            # Draw the dashboard across the bottom of the full window
+            GL.glViewport(0, 0, main_display[0], total_height)
+            dashboard_uploader.draw(0, 0)
+            
+            # Re-enable 3D rendering settings
+            GL.glEnable(GL.GL_DEPTH_TEST)
+            GL.glEnable(GL.GL_LIGHTING)
+            
+            # Restore the 3D projection and modelview matrices
+            GL.glMatrixMode(GL.GL_PROJECTION)
+            GL.glPopMatrix()
+            GL.glMatrixMode(GL.GL_MODELVIEW)
+            GL.glPopMatrix()
         
-        # Disable depth testing and lighting for 2D rendering
-        glDisable(GL_DEPTH_TEST)
-        glDisable(GL_LIGHTING)
+        # Read the finished frame back for the recording, if one is running
+        if frame_capture is not None:
+            with governor.stage("capture"):
+                frame_capture.capture()
         
-        # Draw the dashboard
-        glRasterPos2f(0, 0)
-        dashboard_data = pygame.image.tostring(dashboard_surface, "RGB", True)
-        glDrawPixels(dashboard_display[0], dashboard_display[1], GL_RGB, GL_UNSIGNED_BYTE, dashboard_data)
-        
-        # Re-enable 3D rendering settings
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_LIGHTING)
-        
-        # Restore the 3D projection and modelview matrices
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
-        glPopMatrix()
-        
-        # Swap the buffers to display everything
+        # Swap the buffers to display everything (not timed: it may wait for vsync)
         pygame.display.flip()
+        governor.end_frame()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the open world simulation.")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window and stream the world to the inspection server")
+    parser.add_argument("--agents", type=int, default=50, help="number of agents in a headless run")
+    parser.add_argument("--ticks", type=int, default=None, help="stop a headless run after this many ticks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    if args.headless:
+        try:
+            run_headless(args.agents, args.ticks)
+        except KeyboardInterrupt:
+            pass
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,398 @@
+import ctypes
+import logging
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import zlib
+
+import numpy as np
+from OpenGL.GL import *
+
+from consts import Consts
+
+logger = logging.getLogger(__name__)
+
+class SurfaceUploader:
+    """
+    Streams a pygame surface to a texture through a ring of pixel buffer objects
+    and draws it as a textured quad.
+
+    The surface pixels are handed to OpenGL through a buffer view, so no flipped
+    bytes copy is made on the Python side. Each frame the new pixels are written
+    into the next PBO in the ring while the texture is filled from the previous
+    one, letting the driver overlap the transfer with the rest of the frame.
+
+    Attributes:
+        width (int): Width of the surface in pixels.
+        height (int): Height of the surface in pixels.
+        pbo_count (int): Number of pixel buffer objects in the ring.
+        texture (int): Texture the surface is drawn from.
+    """
+
+    def __init__(self, width, height, pbo_count=Consts.UPLOAD_PBO_COUNT):
+        self.width = width
+        self.height = height
+        self.pbo_count = max(1, pbo_count)
+        self._pbos = [int(b) for b in np.atleast_1d(glGenBuffers(self.pbo_count))]
+        self._pbo_size = 0
+        self._pitch = 0
+        self._index = 0
+        self._uploaded = 0
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0, GL_BGRA, GL_UNSIGNED_BYTE, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def _allocate(self, pitch):
+        """
+        (Re)allocate the PBO ring for a surface with the given row pitch.
+
+        Args:
+            pitch (int): Length of a surface row in bytes.
+        """
+        self._pitch = pitch
+        self._pbo_size = pitch * self.height
+        for pbo in self._pbos:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_UNPACK_BUFFER, self._pbo_size, None, GL_STREAM_DRAW)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        self._uploaded = 0
+
+    def upload(self, surface):
+        """
+        Queue the surface pixels for upload to the texture.
+
+        The surface must be 32 bits per pixel (see Dashboard). Its pixels are
+        read through a buffer view; the surface is only locked for the duration
+        of the copy into the PBO.
+
+        Args:
+            surface (pygame.Surface): Surface to upload.
+        """
+        pitch = surface.get_pitch()
+        if pitch != self._pitch:
+            self._allocate(pitch)
+
+        write_pbo = self._pbos[self._index]
+        self._index = (self._index + 1) % self.pbo_count
+
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, write_pbo)
+        # Orphan the old storage so the driver never waits on a pending transfer
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, self._pbo_size, None, GL_STREAM_DRAW)
+        view = surface.get_buffer()
+        pixels = np.frombuffer(view, dtype=np.uint8)
+        glBufferSubData(GL_PIXEL_UNPACK_BUFFER, 0, self._pbo_size, pixels)
+        del pixels, view  # releases the surface lock
+        self._uploaded += 1
+
+        # Fill the texture from the oldest PBO in the ring, which was written
+        # pbo_count - 1 frames ago (or just now, for a ring of one).
+        read_pbo = self._pbos[self._index] if self._uploaded >= self.pbo_count else write_pbo
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, read_pbo)
+        glPixelStorei(GL_UNPACK_ROW_LENGTH, self._pitch // 4)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.width, self.height, GL_BGRA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glPixelStorei(GL_UNPACK_ROW_LENGTH, 0)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def draw(self, x, y):
+        """
+        Draw the texture as a quad with its bottom-left corner at (x, y).
+
+        Expects an orthographic projection in pixel units. The texture rows are
+        in surface order (top row first), so the texture coordinates are
+        flipped instead of the pixel data.
+
+        Args:
+            x (int): X-coordinate of the bottom-left corner.
+            y (int): Y-coordinate of the bottom-left corner.
+        """
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glColor3f(1.0, 1.0, 1.0)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0.0, 1.0)
+        glVertex2f(x, y)
+        glTexCoord2f(1.0, 1.0)
+        glVertex2f(x + self.width, y)
+        glTexCoord2f(1.0, 0.0)
+        glVertex2f(x + self.width, y + self.height)
+        glTexCoord2f(0.0, 0.0)
+        glVertex2f(x, y + self.height)
+        glEnd()
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_TEXTURE_2D)
+
+    def delete(self):
+        """
+        Release the PBOs and the texture.
+        """
+        glDeleteBuffers(len(self._pbos), self._pbos)
+        glDeleteTextures([self.texture])
+        self._pbos = []
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def _png_chunk(chunk_type, payload):
+    crc = zlib.crc32(payload, zlib.crc32(chunk_type))
+    return struct.pack(">I", len(payload)) + chunk_type + payload + struct.pack(">I", crc)
+
+
+class PngSequenceEncoder:
+    """
+    Writes captured frames as a numbered PNG sequence.
+
+    The PNG chunks are assembled here rather than with pygame.image.save,
+    which holds the GIL for the whole encode and so stalls the render loop.
+    zlib releases the GIL while it compresses.
+
+    Attributes:
+        output_dir (str): Directory the frames are written to.
+        compression (int): zlib compression level.
+    """
+
+    def __init__(self, output_dir, width, height, compression=Consts.CAPTURE_PNG_COMPRESSION):
+        self.output_dir = output_dir
+        self.width = width
+        self.height = height
+        self.compression = compression
+        self._frame = 0
+        self._header = _PNG_SIGNATURE + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, data, timestamp):
+        """
+        Write one frame.
+
+        Args:
+            data (bytes): Bottom-up RGB pixel rows, as read back by OpenGL.
+            timestamp (float): time.perf_counter() when the frame was read back. Unused;
+                the sequence numbers frames consecutively.
+        """
+        rows = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width * 3)
+        # Each scanline starts with its filter type, 0 (none); PNG rows are top-down
+        scanlines = np.empty((self.height, self.width * 3 + 1), dtype=np.uint8)
+        scanlines[:, 0] = 0
+        scanlines[:, 1:] = rows[::-1]
+        with open(os.path.join(self.output_dir, f"frame_{self._frame:06d}.png"), "wb") as f:
+            f.write(self._header)
+            f.write(_png_chunk(b"IDAT", zlib.compress(scanlines, self.compression)))
+            f.write(_png_chunk(b"IEND", b""))
+        self._frame += 1
+
+    def close(self):
+        pass
+
+
+class FfmpegEncoder:
+    """
+    Pipes captured frames to an ffmpeg process producing a video file.
+
+    The video runs in real time: each frame is placed in the 1/fps slot of
+    its capture time. When frames were dropped or rendered slower than fps,
+    the previous frame is repeated for the empty slots; when several frames
+    fall in one slot, only the first is kept.
+
+    Attributes:
+        path (str): Path of the video file being written.
+        fps (float): Frame rate of the video.
+    """
+
+    def __init__(self, path, width, height, fps=Consts.CAPTURE_FPS):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("Video capture requires ffmpeg on the PATH")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.fps = fps
+        self._start = None
+        self._slot = -1  # slot of the last frame written
+        self._previous = None
+        self._process = subprocess.Popen(
+            [ffmpeg, "-loglevel", "error", "-y",
+             "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+             "-i", "-", "-vf", "vflip", "-pix_fmt", "yuv420p", path],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, data, timestamp):
+        """
+        Write one frame.
+
+        Args:
+            data (bytes): Bottom-up RGB pixel rows, as read back by OpenGL.
+            timestamp (float): time.perf_counter() when the frame was read back.
+        """
+        if self._start is None:
+            self._start = timestamp
+        slot = round((timestamp - self._start) * self.fps)
+        if slot <= self._slot:
+            return
+        for _ in range(slot - self._slot - 1):
+            self._process.stdin.write(self._previous)
+        self._process.stdin.write(data)
+        self._slot = slot
+        self._previous = data
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.wait()
+
+
+class FrameCapture:
+    """
+    Reads rendered frames back asynchronously and encodes them on a background thread.
+
+    glReadPixels targets a ring of pixel pack buffers, so the call returns
+    immediately; a buffer is only mapped once it is pbo_count - 1 frames old
+    and its transfer has completed. The mapped pixels are handed to an encoder
+    thread through a bounded queue, with the time each frame was read back.
+    If the encoder falls behind, frames are dropped instead of stalling the
+    render loop. If the encoder fails (e.g.
+    ffmpeg exits), the error is logged and every later frame is dropped.
+
+    Attributes:
+        width (int): Width of the captured area in pixels.
+        height (int): Height of the captured area in pixels.
+        dropped_frames (int): Number of frames dropped because the encoder was busy or had failed.
+        error (Exception or None): The error that stopped the encoder, if any.
+    """
+
+    def __init__(self, width, height, encoder, pbo_count=Consts.CAPTURE_PBO_COUNT,
+                 queue_size=Consts.CAPTURE_QUEUE_SIZE):
+        self.width = width
+        self.height = height
+        self.dropped_frames = 0
+        self.error = None
+        self._encoder = encoder
+        self._frame_size = width * height * 3
+        self._pbo_count = max(2, pbo_count)
+        self._pbos = [int(b) for b in np.atleast_1d(glGenBuffers(self._pbo_count))]
+        for pbo in self._pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self._frame_size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self._timestamps = [0.0] * self._pbo_count
+        self._index = 0
+        self._pending = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._encode_loop, name="frame-encoder", daemon=True)
+        self._thread.start()
+
+    def capture(self):
+        """
+        Start reading back the current frame and collect the oldest finished one.
+
+        Call once per frame, after rendering and before swapping buffers.
+        """
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._pbos[self._index])
+        glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        self._timestamps[self._index] = time.perf_counter()
+        self._index = (self._index + 1) % self._pbo_count
+        self._pending += 1
+        if self._pending >= self._pbo_count:
+            self._collect(self._index)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    def _collect(self, index, block=False):
+        """
+        Map a filled pack buffer and queue its pixels for encoding.
+
+        Args:
+            index (int): Position of the pack buffer in the ring.
+            block (bool): Wait for room in the queue instead of dropping the frame.
+        """
+        self._pending -= 1
+        if not self._thread.is_alive() or (not block and self._queue.full()):
+            self.dropped_frames += 1
+            return
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._pbos[index])
+        ptr = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        if ptr:
+            frame = (ctypes.string_at(ptr, self._frame_size), self._timestamps[index])
+            glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+            if block:
+                if not self._put_while_encoding(frame):
+                    self.dropped_frames += 1
+            else:
+                self._queue.put_nowait(frame)
+
+    def _put_while_encoding(self, item):
+        """
+        Wait for room in the queue, giving up if the encoder thread stops.
+
+        Returns:
+            bool: True if the item was queued.
+        """
+        while self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _encode_loop(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            try:
+                self._encoder.write(*frame)
+            except Exception as e:
+                self.error = e
+                logger.error("Frame encoder failed, dropping the rest of the recording: %r", e)
+                break
+
+    def close(self):
+        """
+        Flush the frames still in flight, stop the encoder thread and release the PBOs.
+        """
+        while self._pending > 0:
+            self._collect((self._index - self._pending) % self._pbo_count, block=True)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self._put_while_encoding(None)
+        self._thread.join()
+        try:
+            self._encoder.close()
+        except Exception as e:
+            self.error = self.error or e
+            logger.error("Frame encoder failed to finish: %r", e)
+        glDeleteBuffers(len(self._pbos), self._pbos)
+        self._pbos = []
+        logger.info("Recording finished, %d frames dropped", self.dropped_frames)
+
+
+def start_frame_capture(width, height):
+    """
+    Start an asynchronous capture of the window using the configured encoder.
+
+    Frames are written below Consts.CAPTURE_OUTPUT_DIR, in a directory (PNG
+    sequence) or file (video) named after the current time.
+
+    Args:
+        width (int): Width of the window in pixels.
+        height (int): Height of the window in pixels.
+
+    Returns:
+        FrameCapture: The running capture. Call close() to finish it.
+    """
+    name = time.strftime("capture_%Y%m%d_%H%M%S")
+    if Consts.CAPTURE_MODE == "video":
+        encoder = FfmpegEncoder(os.path.join(Consts.CAPTURE_OUTPUT_DIR, f"{name}.mp4"), width, height)
+    else:
+        encoder = PngSequenceEncoder(os.path.join(Consts.CAPTURE_OUTPUT_DIR, name), width, height)
+    return FrameCapture(width, height, encoder)
@@ -12,9 +12,11 @@ class Receptor:
     
     VALID_ANGLES = [0, 15, 30, 45, 60, 75, 90]
 
-    def __init__(self):
-        self.angle = random.choice(self.VALID_ANGLES)
-        self.id = f'{uuid.uuid4()}'
+    __slots__ = ("angle", "id", "connected_receptor_id")  # millions of these exist in large worlds
+
+    def __init__(self, angle=None, receptor_id=None):
+        self.angle = random.choice(self.VALID_ANGLES) if angle is None else angle
+        self.id = f'{uuid.uuid4()}' if receptor_id is None else receptor_id
         self.connected_receptor_id = None
 
     def can_connect(self, other_receptor):
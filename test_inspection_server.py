@@ -0,0 +1,136 @@
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import open_world
+from inspection_server import FRAME_DELTA, FRAME_KEY, InspectionServer, read_frame
+from world_query import WorldIndex
+
+def step(agents, world_index):
+    open_world.check_and_create_connections(agents, world_index)
+    agents = open_world.update_agents(agents, 0.5)
+    world_index.refresh(agents)
+    return agents
+
+async def wait_for_clients(server, count):
+    for _ in range(200):
+        if server.client_count >= count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{count} client(s) never connected")
+
+@pytest.fixture
+def server():
+    server = InspectionServer(host="127.0.0.1", port=0, queue_size=2)
+    server.start()
+    yield server
+    server.stop()
+
+def test_key_frame_then_deltas(server):
+    random.seed(1)
+    agents = open_world.create_initial_agents(200)
+    world_index = WorldIndex()
+    world_index.refresh(agents)
+
+    async def client():
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await wait_for_clients(server, 1)
+        nonlocal agents
+        positions = {}
+        for tick in range(1, 11):
+            agents = step(agents, world_index)
+            server.publish(agents, tick)
+            frame = await read_frame(reader)
+            assert frame["tick"] == tick
+            if tick == 1:
+                assert frame["kind"] == FRAME_KEY
+                assert len(frame["spawn_handles"]) == len(agents)
+            else:
+                assert frame["kind"] == FRAME_DELTA
+            for handle, pos in zip(frame["move_handles"], frame["move_positions"]):
+                positions[int(handle)] = pos
+            for handle in frame["deaths"]:
+                del positions[int(handle)]
+            assert frame["stats"]["alive"] == len(agents) == len(positions)
+        writer.close()
+        await writer.wait_closed()
+        return positions
+
+    positions = asyncio.run(client())
+    expected = sorted((a.pos.x, a.pos.z) for a in agents)
+    actual = sorted((float(p[0]), float(p[2])) for p in positions.values())
+    assert [c for pos in actual for c in pos] == pytest.approx([c for pos in expected for c in pos], abs=1e-2)
+
+def test_stalled_client_is_resynced_without_blocking_publish(server):
+    random.seed(2)
+    agents = open_world.create_initial_agents(5000)
+    world_index = WorldIndex()
+    world_index.refresh(agents)
+    reading = threading.Event()
+    kinds = []
+
+    async def client():
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect(("127.0.0.1", server.port))
+        reader, writer = await asyncio.open_connection(sock=sock, limit=4096)
+        await asyncio.get_running_loop().run_in_executor(None, reading.wait)
+        while True:
+            frame = await read_frame(reader)
+            kinds.append((frame["kind"], frame["tick"]))
+            if len(kinds) > 1 and frame["kind"] == FRAME_KEY:
+                break
+        writer.close()
+
+    thread = threading.Thread(target=lambda: asyncio.run(client()))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while server.client_count < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    slowest_publish = 0.0
+    for tick in range(1, 61):
+        for agent in agents:
+            agent._move(0.5)
+        start = time.perf_counter()
+        server.publish(agents, tick)
+        slowest_publish = max(slowest_publish, time.perf_counter() - start)
+        time.sleep(0.005)
+    reading.set()
+    # Keep publishing so the resync key frame gets sent once the client reads again
+    for tick in range(61, 200):
+        for agent in agents:
+            agent._move(0.5)
+        server.publish(agents, tick)
+        time.sleep(0.01)
+        if not thread.is_alive():
+            break
+    thread.join(timeout=10)
+
+    assert slowest_publish < 0.5
+    assert kinds[0] == (FRAME_KEY, 1)
+    resync_kind, resync_tick = kinds[-1]
+    assert resync_kind == FRAME_KEY and resync_tick > 1
+    ticks = [tick for _, tick in kinds]
+    assert ticks != list(range(1, len(ticks) + 1))  # frames were skipped
+
+def test_headless_run_without_opengl():
+    # Block the OpenGL package, as on a host without PyOpenGL installed
+    code = (
+        "import sys; sys.modules['OpenGL'] = None\n"
+        "import open_world\n"
+        "from inspection_server import InspectionServer\n"
+        "server = InspectionServer(port=0)\n"
+        "server.start()\n"
+        "open_world.run_headless(50, ticks=3, tick_rate=None, server=server)\n"
+        "server.stop()\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, timeout=60,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,351 @@
+import heapq
+import math
+from collections import deque
+from operator import attrgetter
+from pygame.math import Vector3
+
+from receptor import Receptor
+from consts import Consts
+
+_total_resources = attrgetter("resources.total")
+
+class WorldIndex:
+    """
+    Maintained indexes over the live agents, for queries that would otherwise
+    scan the whole agent list.
+
+    The index holds:
+        - a uniform grid over the XZ plane for range and nearest-neighbour queries,
+        - per-angle sets of agents that have a free receptor at that angle,
+        - connected clusters, recomputed lazily when connections change,
+        - the results of poorest/richest queries, until the next refresh.
+
+    It reflects the world as of the last call to refresh() or update_agent().
+    Distances are checked against each agent's current position, but agents
+    are looked up in the grid cell they occupied at that time.
+
+    refresh() still visits every agent, since unconnected agents move every
+    tick: it recomputes each agent's grid cell and checks its
+    connection_version. Free receptors and degree are only recomputed for
+    agents whose connections changed. Keeping the index is therefore O(n)
+    per tick, well under the cost of update_agents() itself.
+
+    Resource totals are kept by each agent's Resources and change on every
+    tick for most agents, so no order over them is maintained. poorest() and
+    richest() select the k agents with a heap over the live agents, O(n log k),
+    and cache the answer until the index next changes.
+
+    Attributes:
+        cell_size (float): Edge length of a grid cell.
+    """
+
+    def __init__(self, cell_size=Consts.MIN_DISTANCE_BETWEEN_AGENTS_FOR_CONNECTION):
+        self.cell_size = cell_size
+        self._agents = {}
+        self._cells = {}
+        self._cell_of = {}
+        self._top = {}  # ("poorest" or "richest", k) -> agents, until the index changes
+        self._connection_version = {}
+        self._free_by_angle = {angle: set() for angle in Receptor.VALID_ANGLES}
+        self._free_angles_of = {}
+        self._degree = {}
+        self._cluster_of = None
+        self._clusters = None
+
+    def __len__(self):
+        return len(self._agents)
+
+    def _cell(self, pos):
+        return (math.floor(pos.x / self.cell_size), math.floor(pos.z / self.cell_size))
+
+    def refresh(self, agents):
+        """
+        Bring the index up to date with the agent list.
+
+        Agents that are dead or no longer in the list are dropped.
+
+        Args:
+            agents (list): List of all agents in the simulation.
+        """
+        self._top.clear()
+        live_ids = set()
+        for agent in agents:
+            if not agent.is_alive:
+                continue
+            live_ids.add(agent.id)
+            self._update(agent)
+
+        for agent_id in [agent_id for agent_id in self._agents if agent_id not in live_ids]:
+            self._remove(agent_id)
+
+    def update_agent(self, agent):
+        """
+        Update the index entries of a single agent, e.g. after it connected.
+
+        Args:
+            agent (Agent): The agent to update.
+        """
+        self._top.clear()
+        if not agent.is_alive:
+            if agent.id in self._agents:
+                self._remove(agent.id)
+            return
+        self._update(agent)
+
+    def _update(self, agent):
+        """
+        Update the grid, free receptor and degree entries of an agent.
+        """
+        agent_id = agent.id
+        self._agents[agent_id] = agent
+
+        cell = self._cell(agent.pos)
+        old_cell = self._cell_of.get(agent_id)
+        if cell != old_cell:
+            if old_cell is not None:
+                self._discard_from_cell(old_cell, agent)
+            self._cells.setdefault(cell, set()).add(agent)
+            self._cell_of[agent_id] = cell
+
+        version = agent.connection_version
+        if self._connection_version.get(agent_id) == version:
+            return
+        self._connection_version[agent_id] = version
+
+        free_angles = frozenset(r.angle for r in agent.receptors if r.connected_receptor_id is None)
+        old_free_angles = self._free_angles_of.get(agent_id, frozenset())
+        if free_angles != old_free_angles:
+            for angle in old_free_angles - free_angles:
+                self._free_by_angle[angle].discard(agent)
+            for angle in free_angles - old_free_angles:
+                self._free_by_angle[angle].add(agent)
+            self._free_angles_of[agent_id] = free_angles
+
+        degree = len(agent.connected_agents)
+        if self._degree.get(agent_id) != degree:
+            self._degree[agent_id] = degree
+            self._clusters = None
+
+    def _discard_from_cell(self, cell, agent):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(agent)
+            if not members:
+                del self._cells[cell]
+
+    def _remove(self, agent_id):
+        agent = self._agents.pop(agent_id)
+        self._discard_from_cell(self._cell_of.pop(agent_id), agent)
+        for angle in self._free_angles_of.pop(agent_id, ()):
+            self._free_by_angle[angle].discard(agent)
+        self._degree.pop(agent_id, None)
+        self._connection_version.pop(agent_id, None)
+        self._top.clear()
+        self._clusters = None
+
+    def agents_within(self, point, radius):
+        """
+        Find the agents strictly closer than radius to a point.
+
+        Args:
+            point (Vector3): Centre of the search.
+            radius (float): Search radius.
+
+        Returns:
+            list: Agents within the radius, in no particular order.
+        """
+        reach = math.ceil(radius / self.cell_size)
+        radius_squared = radius * radius
+        cx, cz = self._cell(point)
+        found = []
+        for x in range(cx - reach, cx + reach + 1):
+            for z in range(cz - reach, cz + reach + 1):
+                for agent in self._cells.get((x, z), ()):
+                    if agent.is_alive and point.distance_squared_to(agent.pos) < radius_squared:
+                        found.append(agent)
+        return found
+
+    def nearest(self, point, k):
+        """
+        Find the k agents closest to a point.
+
+        Searches rings of grid cells outwards from the point until the k-th
+        closest agent found so far is nearer than any unvisited cell.
+
+        Args:
+            point (Vector3): Centre of the search.
+            k (int): Number of agents to return.
+
+        Returns:
+            list: Up to k agents, closest first.
+        """
+        if k <= 0 or not self._agents:
+            return []
+        cx, cz = self._cell(point)
+        # Agents are kept inside the field, so no ring beyond its edge can hold any
+        lo_x, lo_z = self._cell(Vector3(Consts.AGENT_FIELD_CENTER) - Vector3(Consts.AGENT_FIELD_RADIUS, 0, Consts.AGENT_FIELD_RADIUS))
+        hi_x, hi_z = self._cell(Vector3(Consts.AGENT_FIELD_CENTER) + Vector3(Consts.AGENT_FIELD_RADIUS, 0, Consts.AGENT_FIELD_RADIUS))
+        max_ring = max(abs(cx - lo_x), abs(cx - hi_x), abs(cz - lo_z), abs(cz - hi_z)) + 1
+        best = []  # max-heap of (-distance, id, agent)
+        ring = 0
+        while ring <= max_ring:
+            for cell in self._ring_cells(cx, cz, ring):
+                for agent in self._cells.get(cell, ()):
+                    if not agent.is_alive:
+                        continue
+                    entry = (-(agent.pos - point).length(), agent.id, agent)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+            # Everything in later rings is at least ring * cell_size away
+            if len(best) == k and -best[0][0] <= ring * self.cell_size:
+                break
+            ring += 1
+        return [agent for _, _, agent in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _ring_cells(cx, cz, ring):
+        """
+        Yield the cells on the square ring at Chebyshev distance ring from (cx, cz).
+        """
+        if ring == 0:
+            yield (cx, cz)
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield (x, cz - ring)
+            yield (x, cz + ring)
+        for z in range(cz - ring + 1, cz + ring):
+            yield (cx - ring, z)
+            yield (cx + ring, z)
+
+    def poorest(self, k):
+        """
+        Get the k agents with the lowest total resources.
+
+        Args:
+            k (int): Number of agents to return.
+
+        Returns:
+            list: Up to k agents, poorest first.
+        """
+        key = ("poorest", k)
+        if key not in self._top:
+            self._top[key] = heapq.nsmallest(k, self._agents.values(), key=_total_resources)
+        return list(self._top[key])
+
+    def richest(self, k):
+        """
+        Get the k agents with the highest total resources.
+
+        Args:
+            k (int): Number of agents to return.
+
+        Returns:
+            list: Up to k agents, richest first.
+        """
+        key = ("richest", k)
+        if key not in self._top:
+            self._top[key] = heapq.nlargest(k, self._agents.values(), key=_total_resources)
+        return list(self._top[key])
+
+    def total_resources(self, agent):
+        """
+        Get the total resources of an agent.
+
+        Args:
+            agent (Agent): The agent to look up.
+
+        Returns:
+            float: Sum of the agent's resource amounts.
+        """
+        return agent.resources.total
+
+    def agents_with_free_receptor(self, angle):
+        """
+        Get the agents that have an unconnected receptor at the given angle.
+
+        Args:
+            angle (int): One of Receptor.VALID_ANGLES.
+
+        Returns:
+            set: The matching agents. Do not modify.
+        """
+        if angle not in self._free_by_angle:
+            raise ValueError(f"Invalid receptor angle {angle}, expected one of {Receptor.VALID_ANGLES}")
+        return self._free_by_angle[angle]
+
+    def free_angles(self, agent):
+        """
+        Get the angles of an agent's unconnected receptors.
+
+        Args:
+            agent (Agent): The agent to look up.
+
+        Returns:
+            frozenset: Angles with at least one free receptor.
+        """
+        return self._free_angles_of.get(agent.id, frozenset())
+
+    def _build_clusters(self):
+        """
+        Group the agents into connected clusters.
+
+        A cluster is identified by the smallest agent id among its members, so
+        the id is stable for as long as the membership does not change.
+        """
+        self._cluster_of = {}
+        self._clusters = {}
+        for agent_id, agent in self._agents.items():
+            if agent_id in self._cluster_of:
+                continue
+            members = [agent]
+            seen = {agent_id}
+            pending = deque([agent])
+            while pending:
+                for other in pending.popleft().connected_agents:
+                    if other.id not in seen and other.id in self._agents:
+                        seen.add(other.id)
+                        members.append(other)
+                        pending.append(other)
+            cluster_id = min(seen)
+            self._clusters[cluster_id] = members
+            for member_id in seen:
+                self._cluster_of[member_id] = cluster_id
+
+    def cluster_of(self, agent):
+        """
+        Get the id of the connected cluster an agent belongs to.
+
+        Args:
+            agent (Agent): The agent to look up.
+
+        Returns:
+            str: The cluster id.
+        """
+        if self._clusters is None:
+            self._build_clusters()
+        return self._cluster_of[agent.id]
+
+    def clusters(self):
+        """
+        Get all connected clusters.
+
+        Returns:
+            dict: Cluster id to list of member agents. Do not modify.
+        """
+        if self._clusters is None:
+            self._build_clusters()
+        return self._clusters
+
+    def bad_agents_in_cluster(self, cluster_id):
+        """
+        Get the bad agents of a connected cluster.
+
+        Args:
+            cluster_id (str): Id as returned by cluster_of() or clusters().
+
+        Returns:
+            list: The bad agents in the cluster.
+        """
+        return [agent for agent in self.clusters().get(cluster_id, ()) if agent.is_bad]